@@ -1,12 +1,60 @@
+import bisect
+import functools
+import logging
+import os
+import queue
+import secrets
 import sqlite3
+import string
+import threading
 import json
 import time
+
+try:
+    import orjson
+    _loads = orjson.loads  # Rust-based parser, ~3-5x faster than stdlib
+
+    def _dumps(obj):
+        return orjson.dumps(obj).decode()  # compact output for sqlite TEXT columns
+except ImportError:
+    orjson = None
+    _loads = json.loads
+
+    def _dumps(obj):
+        return json.dumps(obj, separators=(',', ':'))
+
+try:
+    import simdjson
+    # Parser instances are reused (allocation is the dominant cost) but are
+    # not thread-safe, so each worker thread gets its own via threading.local
+    _simd_local = threading.local()
+except ImportError:
+    simdjson = None
+    _simd_local = None
+
+# Blobs at least this large go through simdjson's SIMD structural scan
+_SIMD_THRESHOLD = 4096
+
+def _loads_blob(raw):
+    """Parse a JSON column value, routing large blobs through simdjson."""
+    if simdjson is not None and len(raw) >= _SIMD_THRESHOLD:
+        parser = getattr(_simd_local, 'parser', None)
+        if parser is None:
+            parser = _simd_local.parser = simdjson.Parser()
+        try:
+            doc = parser.parse(raw.encode() if isinstance(raw, str) else raw)
+            return doc.as_dict() if isinstance(doc, simdjson.Object) else doc.as_list()
+        except Exception:
+            pass  # fall back to the regular parser below
+    return _loads(raw)
 import math
 import asyncio
 from uuid import uuid4
 from typing import Dict, List, Optional, Union, Any
-from fastapi import FastAPI, HTTPException, Body, BackgroundTasks, Request, Depends
+from fastapi import FastAPI, HTTPException, Body, BackgroundTasks, Response, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel
 from passlib.context import CryptContext
@@ -18,7 +66,10 @@ from datetime import datetime, timedelta
 # ==========================================
 SECRET_KEY = "SUPER_SECRET_KEY_FOR_BETHUB_JWT_AUTHENTICATION" # Change this in production!
 ALGORITHM = "HS256"
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# One shared context; bcrypt cost pinned explicitly so a passlib default
+# bump can't silently change login latency (2^12 rounds ~ 100ms of CPU,
+# which runs on Starlette's worker threads, not the event loop)
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=12)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
 def get_current_user(token: str = Depends(oauth2_scheme)):
@@ -42,24 +93,250 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
 
 DB_FILE = "bethub.db"
 
+logger = logging.getLogger(__name__)
+
+# Bump whenever init_db gains new DDL so existing DBs re-run migrations
+_SCHEMA_VERSION = 3
+
+# Invite codes for private bets
+_BET_CODE_ALPHABET = string.ascii_uppercase + string.digits
+
+# Minimum seconds between expiration sweeps (they run on hot paths)
+_EXPIRY_CHECK_INTERVAL = 30.0
+
+# Connection pool: reopening SQLite per call re-parses the schema and
+# throws away the page cache. Connections are reused across requests;
+# close() just returns them to the pool.
+_POOL_SIZE = min(8, (os.cpu_count() or 4) * 2)
+_pool = queue.Queue(maxsize=_POOL_SIZE)
+
+# Hot statements as module constants: byte-identical SQL strings hit
+# sqlite3's per-connection statement cache and skip re-parsing.
+SQL_GET_USER = "SELECT * FROM user WHERE email=?"
+SQL_GET_BET = "SELECT * FROM bets WHERE id=?"
+# Single ledger-entry write path: money moves by a delta computed in SQL and
+# the record lands as one row in the append-only transactions table, so a
+# write costs O(entry) regardless of how long the user's history is.
+SQL_CREDIT_USER = "UPDATE user SET money = money + ? WHERE email=?"
+SQL_INSERT_TXN = "INSERT INTO transactions (email, ts, entry) VALUES (?, ?, ?)"
+
+
+# Listing cache: GET /bets is the hottest read and most requests see an
+# identical listing. Entries live a couple of seconds and every bet write
+# simply drops the whole cache - cheaper than tracking which listing a
+# given write touches, and staleness is bounded by the TTL either way.
+_BETS_CACHE_TTL = 2.0
+# The key is the user-supplied type filter, so cap the cache and evict the
+# oldest entry on insert; random ?type= values must not grow memory.
+_BETS_CACHE_MAX = 64
+_bets_cache = {}
+
+
+def _bets_cache_get(key):
+    hit = _bets_cache.get(key)
+    if hit is None:
+        return None
+    if hit[0] <= time.monotonic():
+        _bets_cache.pop(key, None)
+        return None
+    return hit[1]
+
+
+def _bets_cache_put(key, value):
+    while len(_bets_cache) >= _BETS_CACHE_MAX:
+        try:
+            del _bets_cache[next(iter(_bets_cache))]  # oldest insertion first
+        except (StopIteration, KeyError):
+            break
+    _bets_cache[key] = (time.monotonic() + _BETS_CACHE_TTL, value)
+
+
+def _bets_cache_clear():
+    _bets_cache.clear()
+
+
+def _apply_ledger(conn, rows):
+    """Flush (money_delta, entry, email) ledger rows: credit the balances
+    and record each entry, both as batched statements."""
+    conn.executemany(SQL_CREDIT_USER, [(delta, email) for delta, _, email in rows])
+    conn.executemany(SQL_INSERT_TXN,
+                     [(email, entry.get('timestamp') or time.time(), _dumps(entry))
+                      for _, entry, email in rows])
+
+@functools.lru_cache(maxsize=64)
+def _column_names(description):
+    # One tuple of names per distinct query shape (description is hashable)
+    return tuple(d[0] for d in description)
+
+def _dict_row_factory(cursor, row):
+    # Build the final dict in one pass; skips the sqlite3.Row intermediate
+    # and the dict(row) copy that used to follow it. The column-name tuple
+    # is cached per query shape so rows pay only dict(zip(...)).
+    return dict(zip(_column_names(cursor.description), row))
+
+class _PooledConnection(sqlite3.Connection):
+    def close(self):
+        if self.in_transaction:
+            self.rollback()  # never hand back a connection mid-transaction
+        try:
+            _pool.put_nowait(self)
+        except queue.Full:
+            sqlite3.Connection.close(self)
+
 def get_db_connection():
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def dict_from_row(row: sqlite3.Row) -> Dict:
-    d = dict(row)
-    # Parse JSON fields automatically
-    json_keys = ['pvt_cards', 'bet_admin', 'bet_joined', 'transaction_history', 'participants', 'outcomes', 'odds', 'comments']
-    for k in json_keys:
-        if k in d and d[k]:
+    try:
+        return _pool.get_nowait()
+    except queue.Empty:
+        conn = sqlite3.connect(DB_FILE, factory=_PooledConnection, check_same_thread=False, cached_statements=512)
+        conn.row_factory = _dict_row_factory
+        # WAL lets readers run concurrently with writers; mmap serves reads
+        # straight from the OS page cache without read() syscalls.
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA mmap_size=268435456")
+        conn.execute("PRAGMA busy_timeout=5000")
+        # WAL makes synchronous=NORMAL safe (no torn commits, at most a
+        # lost tail on power failure); the rest trade memory for I/O.
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-65536")
+        conn.execute("PRAGMA wal_autocheckpoint=1000")
+        return conn
+
+def close_pool():
+    """Really close every pooled connection (shutdown path)."""
+    while True:
+        try:
+            sqlite3.Connection.close(_pool.get_nowait())
+        except queue.Empty:
+            break
+
+class _LazyRow(dict):
+    """
+    Row dict that defers JSON column decoding until a key is first accessed.
+    Callers that only read scalar columns never pay for parsing the blobs.
+    """
+    __slots__ = ('_pending',)
+
+    def __init__(self, data, pending):
+        super().__init__(data)
+        self._pending = pending
+
+    def _decode(self, k):
+        self._pending.discard(k)
+        raw = dict.__getitem__(self, k)
+        if raw:
             try:
-                d[k] = json.loads(d[k])
-            except:
-                d[k] = [] if k != 'odds' else {}
-        elif k in d:
-             d[k] = [] if k != 'odds' else {}
-    return d
+                if k in _MEMO_KEYS and isinstance(raw, str):
+                    dict.__setitem__(self, k, _memo_loads(raw))
+                else:
+                    dict.__setitem__(self, k, _loads_blob(raw))
+                return
+            except (ValueError, TypeError):
+                pass
+        dict.__setitem__(self, k, [] if k != 'odds' else {})
+
+    def _decode_all(self):
+        for k in tuple(self._pending):
+            self._decode(k)
+
+    def __getitem__(self, k):
+        if k in self._pending:
+            self._decode(k)
+        return dict.__getitem__(self, k)
+
+    def __setitem__(self, k, v):
+        self._pending.discard(k)
+        dict.__setitem__(self, k, v)
+
+    def get(self, k, default=None):
+        if k in self._pending:
+            self._decode(k)
+        return dict.get(self, k, default)
+
+    def items(self):
+        self._decode_all()
+        return dict.items(self)
+
+    def values(self):
+        self._decode_all()
+        return dict.values(self)
+
+    def copy(self):
+        self._decode_all()
+        return dict(self)
+
+# Columns stored as JSON text, shared by the user and bets tables
+_JSON_KEYS = frozenset({'pvt_cards', 'bet_admin', 'bet_joined', 'transaction_history', 'participants', 'outcomes', 'odds', 'comments'})
+
+# Columns safe to memoize by raw text: identical outcome lists / odds
+# tables repeat across many bets and are never mutated in place.
+# (participants/comments/histories ARE appended to, so they stay uncached.)
+_MEMO_KEYS = frozenset({'outcomes', 'odds'})
+
+@functools.lru_cache(maxsize=4096)
+def _memo_loads(raw):
+    return _loads_blob(raw)
+
+def dict_from_row(row) -> Dict:
+    # Rows arrive as plain dicts from _dict_row_factory; JSON fields are
+    # decoded lazily on first access.
+    d = row if type(row) is dict else dict(row)
+    pending = d.keys() & _JSON_KEYS
+    if not pending:
+        return d  # no JSON columns: skip the wrapper copy entirely
+    return _LazyRow(d, pending)
+
+def dicts_from_rows(rows) -> List[Dict]:
+    """
+    Convert many rows at once for list endpoints that serialize everything.
+    Decodes column-by-column in tight loops instead of per-row.
+    """
+    if not rows:
+        return []
+    dicts = rows if type(rows[0]) is dict else [dict(r) for r in rows]
+    for k in _JSON_KEYS.intersection(dicts[0]):
+        loads = _memo_loads if k in _MEMO_KEYS else _loads_blob
+        for d in dicts:
+            v = d[k]
+            if v:
+                try:
+                    d[k] = loads(v)
+                    continue
+                except (ValueError, TypeError):
+                    pass
+            d[k] = [] if k != 'odds' else {}
+    return dicts
+
+# ==========================================
+# ECONOMY HELPERS (pure + memoized)
+# ==========================================
+
+@functools.lru_cache(maxsize=4096)
+def _trust_score(loans_taken, loans_repaid, on_time_repayments, default_count):
+    if loans_taken <= 0 and loans_repaid <= 0:
+        return 0  # no history: both ratios are zero, penalty only subtracts
+
+    # Repayment Ratio
+    repayment_ratio = (loans_repaid / loans_taken) if loans_taken > 0 else 0.0
+
+    # Timeliness Score
+    timeliness_score = (on_time_repayments / loans_repaid) if loans_repaid > 0 else 0.0
+
+    # Base Trust (Scaled to 1000) minus Penalty, clamped in one expression
+    final_score = 1000.0 * (0.6 * repayment_ratio + 0.4 * timeliness_score) - 150.0 * default_count
+    if final_score <= 0:
+        return 0
+    return 1000 if final_score >= 1000 else int(final_score)
+
+# Trust-score buckets: scores below each threshold map to the multiplier
+# at the same position (see get_loan_limit docstring for the tiers).
+_LOAN_THRESHOLDS = (50, 300, 500, 700, 850)
+_LOAN_MULTIPLIERS = (0.0, 0.2, 0.5, 1.0, 1.5, 2.0)
+
+@functools.lru_cache(maxsize=1024)
+def _loan_limit(trust_score):
+    multiplier = _LOAN_MULTIPLIERS[bisect.bisect_right(_LOAN_THRESHOLDS, trust_score)]
+    return min(2500.0 * multiplier, 5000.0) # Absolute Cap at 5000
 
 # ==========================================
 # BACKEND LOGIC CLASS
@@ -72,11 +349,18 @@ class BetHubBackend:
     
     def __init__(self):
         self.init_db()
+        self._last_expiry_check = 0.0
 
     def init_db(self):
         conn = get_db_connection()
         c = conn.cursor()
-        
+
+        # Fast path: schema already at the current version, skip the DDL
+        # (each ALTER attempt below takes a write lock and parses SQL)
+        if c.execute("PRAGMA user_version").fetchone()['user_version'] == _SCHEMA_VERSION:
+            conn.close()
+            return
+
         # 1. USER Table
         c.execute('''CREATE TABLE IF NOT EXISTS user (
             email TEXT PRIMARY KEY,
@@ -156,6 +440,34 @@ class BetHubBackend:
         try: c.execute("ALTER TABLE user ADD COLUMN loan_total_interest REAL DEFAULT 0")
         except: pass
 
+        # 3. TRANSACTIONS Table (append-only ledger; one row per entry so a
+        # write never rewrites a user's whole history)
+        c.execute('''CREATE TABLE IF NOT EXISTS transactions (
+            email TEXT NOT NULL,
+            ts REAL NOT NULL,
+            entry TEXT NOT NULL -- JSON Dict
+        )''')
+        c.execute("CREATE INDEX IF NOT EXISTS idx_transactions_email_ts ON transactions(email, ts)")
+
+        # One-shot migration: explode any legacy transaction_history blobs
+        # into ledger rows, then blank the blobs so nothing double-counts
+        c.execute('''INSERT INTO transactions (email, ts, entry)
+                     SELECT user.email, COALESCE(value->>'timestamp', 0.0), value
+                     FROM user, json_each(COALESCE(user.transaction_history, '[]'))''')
+        c.execute("UPDATE user SET transaction_history='[]' WHERE transaction_history IS NOT NULL AND transaction_history != '[]'")
+
+        # Index for the invite-code lookup (only non-PK point query on bets);
+        # unique so code collisions surface instead of joining the wrong bet
+        c.execute("DROP INDEX IF EXISTS idx_bets_bet_code")
+        c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_bets_bet_code ON bets(bet_code) WHERE bet_code IS NOT NULL")
+        # Expiry sweep and public listing filters
+        c.execute("CREATE INDEX IF NOT EXISTS idx_bets_status_end ON bets(status, end_time)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_bets_type_start ON bets(bet_type, start_time DESC)")
+        # Canonicalize bet_type so the listing filter can use the index
+        c.execute("UPDATE bets SET bet_type=UPPER(bet_type) WHERE bet_type != UPPER(bet_type)")
+
+        c.execute("PRAGMA user_version=%d" % _SCHEMA_VERSION)
+
         conn.commit()
         conn.close()
 
@@ -169,25 +481,13 @@ class BetHubBackend:
         Penalty = 15 * Default Count
         Final Score = Clamp(Base Trust - Penalty, 0, 100)
         """
-        loans_taken = user.get('loans_taken', 0) or 0
-        loans_repaid = user.get('loans_repaid', 0) or 0
-        on_time_repayments = user.get('on_time_repayments', 0) or 0
-        default_count = user.get('default_count', 0) or 0
-
-        # Repayment Ratio
-        repayment_ratio = (loans_repaid / loans_taken) if loans_taken > 0 else 0.0
-        
-        # Timeliness Score
-        timeliness_score = (on_time_repayments / loans_repaid) if loans_repaid > 0 else 0.0
-        
-        # Base Trust (Scaled to 1000)
-        base_trust = 1000.0 * (0.6 * repayment_ratio + 0.4 * timeliness_score)
-        
-        # Penalty (Scaled)
-        penalty = 150.0 * default_count
-        
-        final_score = base_trust - penalty
-        return int(max(0, min(1000, final_score)))
+        # `or 0` alone covers both missing keys and NULL column values
+        return _trust_score(
+            user.get('loans_taken') or 0,
+            user.get('loans_repaid') or 0,
+            user.get('on_time_repayments') or 0,
+            user.get('default_count') or 0,
+        )
 
     def get_loan_limit(self, trust_score: int) -> float:
         """
@@ -201,21 +501,7 @@ class BetHubBackend:
         Base Limit = 2500
         MAX CAP = 5000 (2500 * 2.0)
         """
-        if trust_score < 50:
-            multiplier = 0.0
-        elif trust_score < 300:
-            multiplier = 0.2
-        elif trust_score < 500:
-            multiplier = 0.5
-        elif trust_score < 700:
-            multiplier = 1.0
-        elif trust_score < 850:
-            multiplier = 1.5
-        else:
-            multiplier = 2.0
-            
-        calculated = 2500.0 * multiplier
-        return min(calculated, 5000.0) # Absolute Cap at 5000
+        return _loan_limit(trust_score)
 
     def calculate_refund_amount(self, user_bet_amount: float, total_pool_volume: float, chosen_option_volume: float, risk_multiplier: float = 0.05) -> float:
         """
@@ -241,30 +527,37 @@ class BetHubBackend:
 
     # --- ADMIN / HELPER LOGIC ---
     
-    def calculate_money(self, bet_id: str):
+    def calculate_money(self, bet_id: str, bet: Optional[Dict] = None):
         """
         Calculates dynamic odds based on the Parimutuel system.
         Odds = Net Pool / Amount Bet on Outcome
+        Callers that already hold the bet row can pass it to skip the re-read.
         """
         HOUSE_FEE = 0.05 # 5% Fee
 
         conn = get_db_connection()
-        bet_row = conn.execute("SELECT * FROM bets WHERE id=?", (bet_id,)).fetchone()
-        
-        if not bet_row: conn.close(); return
-        bet = dict_from_row(bet_row)
-        conn.close() # Close read connection
-        
+        if bet is None:
+            bet_row = conn.execute("SELECT pool, outcomes FROM bets WHERE id=?", (bet_id,)).fetchone()
+
+            if not bet_row: conn.close(); return
+            bet = bet_row
+
         pool = bet['pool']
-        participants = bet['participants'] # List of dicts
-        outcomes = json.loads(bet['outcomes']) if isinstance(bet['outcomes'], str) else bet['outcomes']
-        
-        # 1. Calculate Total Bets per Outcome
+        outcomes = _loads(bet['outcomes']) if isinstance(bet['outcomes'], str) else bet['outcomes']
+
+        # 1. Total bets per outcome, aggregated inside SQLite (json_each walks
+        # the participants blob in C - the list never crosses into Python here)
         outcome_stakes = {o: 0.0 for o in outcomes}
-        for p in participants:
-            if p['prediction'] in outcome_stakes:
-                outcome_stakes[p['prediction']] += p['amount']
-        
+        stake_rows = conn.execute(
+            "SELECT json_extract(value, '$.prediction') AS outcome, "
+            "SUM(json_extract(value, '$.amount')) AS stake "
+            "FROM bets, json_each(bets.participants) WHERE bets.id=? GROUP BY outcome",
+            (bet_id,)
+        ).fetchall()
+        for row in stake_rows:
+            if row['outcome'] in outcome_stakes:
+                outcome_stakes[row['outcome']] = row['stake']
+
         # 2. Net Pool
         net_pool = pool * (1 - HOUSE_FEE)
         
@@ -277,63 +570,80 @@ class BetHubBackend:
                 current_odds[o] = round(net_pool / stake, 2)
             else:
                 current_odds[o] = 0.0 # No bets yet, effectively infinite or base
-                
-        # Update DB
-        conn = get_db_connection()
-        conn.execute("UPDATE bets SET odds=? WHERE id=?", (json.dumps(current_odds), bet_id))
+
+        # Update DB (same connection as the read)
+        conn.execute("UPDATE bets SET odds=? WHERE id=?", (_dumps(current_odds), bet_id))
         conn.commit()
         conn.close()
+        _bets_cache_clear()
         
         return current_odds
 
-    def check_expirations(self):
+    def check_expirations(self, force=False):
         """
         Checks for bets that have ended > 4 hours ago and have no result.
-        Refunds everyone.
+        Refunds everyone. Normally driven by the background sweeper task;
+        the throttle keeps any remaining inline callers cheap.
         """
+        now_mono = time.monotonic()
+        if not force and now_mono - self._last_expiry_check < _EXPIRY_CHECK_INTERVAL:
+            return
+        self._last_expiry_check = now_mono
+
         conn = get_db_connection()
         cutoff = time.time() - (4 * 3600)
-        
-        expired_bets = conn.execute("SELECT * FROM bets WHERE status='OPEN' AND end_time < ?", (cutoff,)).fetchall()
-        
+
+        # Flip the status and collect the affected rows in one statement
+        expired_bets = conn.execute(
+            "UPDATE bets SET status='EXPIRED' WHERE status='OPEN' AND end_time < ? RETURNING id, participants",
+            (cutoff,)).fetchall()
+
+        if not expired_bets:
+            conn.close()
+            return
+
+        # Refund Logic: each stake becomes one ledger row; the deltas and
+        # records are applied in bulk so no user rows need reading first
+        refunds = []
         for row in expired_bets:
             bet = dict_from_row(row)
-            bet_id = bet['id']
-            
-            # Refund Logic
             for p in bet['participants']:
-                 u_row = conn.execute("SELECT * FROM user WHERE email=?", (p['user'],)).fetchone()
-                 if u_row:
-                    u = dict_from_row(u_row)
-                    u['money'] += p['amount']
-                    u['transaction_history'].append({"type": "REFUND_EXPIRED", "amount": p['amount'], "bet": bet_id})
-                    conn.execute("UPDATE user SET money=?, transaction_history=? WHERE email=?", 
-                                 (u['money'], json.dumps(u['transaction_history']), p['user']))
-            
-            conn.execute("UPDATE bets SET status='EXPIRED' WHERE id=?", (bet_id,))
-            print(f"Expired bet {bet_id} and refunded participants.")
-            
-        if expired_bets:
-            conn.commit()
+                entry = {"type": "REFUND_EXPIRED", "amount": p['amount'], "bet": bet['id']}
+                refunds.append((p['amount'], entry, p['user']))
+            logger.info("Expired bet %s and refunded participants.", bet['id'])
+
+        if refunds:
+            _apply_ledger(conn, refunds)
+
+        conn.commit()
         conn.close()
+        _bets_cache_clear()
 
     # --- DATA ACCESS ---
 
     def get_bets(self, bet_type: Optional[str] = None):
+        # bet_type is stored upper-cased, so the filter stays indexable
+        key = bet_type.upper() if bet_type else 'PUBLIC'
+        cached = _bets_cache_get(key)
+        if cached is not None:
+            return cached
+
         conn = get_db_connection()
         if bet_type:
-            rows = conn.execute("SELECT * FROM bets WHERE UPPER(bet_type)=? ORDER BY start_time DESC", (bet_type.upper(),)).fetchall()
+            rows = conn.execute("SELECT * FROM bets WHERE bet_type=? ORDER BY start_time DESC", (key,)).fetchall()
         else:
             # By default, only show PUBLIC bets (private bets are invitation-only)
-            rows = conn.execute("SELECT * FROM bets WHERE UPPER(bet_type)='PUBLIC' ORDER BY start_time DESC").fetchall()
+            rows = conn.execute("SELECT * FROM bets WHERE bet_type='PUBLIC' ORDER BY start_time DESC").fetchall()
         conn.close()
-        return [dict_from_row(r) for r in rows]
+        bets = dicts_from_rows(rows)
+        _bets_cache_put(key, bets)
+        return bets
 
     def get_user(self, email: str):
         if not email: return None
         email = email.lower().strip()
         conn = get_db_connection()
-        row = conn.execute("SELECT * FROM user WHERE email=?", (email,)).fetchone()
+        row = conn.execute(SQL_GET_USER, (email,)).fetchone()
         conn.close()
         if row:
             user_data = dict_from_row(row)
@@ -351,7 +661,7 @@ class BetHubBackend:
 
     def get_bet(self, bet_id: str, requesting_user_email: str = None):
         conn = get_db_connection()
-        row = conn.execute("SELECT * FROM bets WHERE id=?", (bet_id,)).fetchone()
+        row = conn.execute(SQL_GET_BET, (bet_id,)).fetchone()
         conn.close()
         if row:
             bet = dict_from_row(row)
@@ -372,7 +682,7 @@ class BetHubBackend:
         joined_ids = user.get('bet_joined', [])
         admin_ids = user.get('bet_admin', [])
         
-        all_ids = list(set(joined_ids + admin_ids)) # Unique IDs
+        all_ids = list(dict.fromkeys(joined_ids + admin_ids)) # Unique IDs, insertion order kept
         
         if not all_ids: return []
         
@@ -381,8 +691,8 @@ class BetHubBackend:
         conn = get_db_connection()
         rows = conn.execute(f"SELECT * FROM bets WHERE id IN ({placeholders})", all_ids).fetchall()
         conn.close()
-        
-        return [dict_from_row(r) for r in rows]
+
+        return dicts_from_rows(rows)
 
     # --- ACTION METHODS ---
 
@@ -391,11 +701,6 @@ class BetHubBackend:
              return {"error": "All fields are mandatory"}
 
         email = email.lower().strip()
-        conn = get_db_connection()
-        if conn.execute("SELECT 1 FROM user WHERE email=?", (email,)).fetchone():
-            conn.close()
-            return {"error": "User exists"}
-            
         hashed_password = pwd_context.hash(password)
         
         new_user = {
@@ -404,11 +709,17 @@ class BetHubBackend:
             "loans_taken": 0, "loans_repaid": 0, "on_time_repayments": 0, "default_count": 0, "last_loan_timestamp": 0,
             "loan_interest_rate": 0.0, "loan_due_date": 0.0, "loan_total_interest": 0.0,
             "pvt_cards": 10,
-            "bet_admin": json.dumps([]), "bet_joined": json.dumps([]), "transaction_history": json.dumps([])
+            "bet_admin": _dumps([]), "bet_joined": _dumps([]), "transaction_history": _dumps([])
         }
         
-        conn.execute('''INSERT INTO user (email, name, password, money, loan, trust, loans_taken, loans_repaid, on_time_repayments, default_count, last_loan_timestamp, loan_interest_rate, loan_due_date, loan_total_interest, pvt_cards, bet_admin, bet_joined, transaction_history)
-                        VALUES (:email, :name, :password, :money, :loan, :trust, :loans_taken, :loans_repaid, :on_time_repayments, :default_count, :last_loan_timestamp, :loan_interest_rate, :loan_due_date, :loan_total_interest, :pvt_cards, :bet_admin, :bet_joined, :transaction_history)''', new_user)
+        conn = get_db_connection()
+        # Single statement: the PK enforces uniqueness, so no preflight SELECT
+        cur = conn.execute('''INSERT INTO user (email, name, password, money, loan, trust, loans_taken, loans_repaid, on_time_repayments, default_count, last_loan_timestamp, loan_interest_rate, loan_due_date, loan_total_interest, pvt_cards, bet_admin, bet_joined, transaction_history)
+                        VALUES (:email, :name, :password, :money, :loan, :trust, :loans_taken, :loans_repaid, :on_time_repayments, :default_count, :last_loan_timestamp, :loan_interest_rate, :loan_due_date, :loan_total_interest, :pvt_cards, :bet_admin, :bet_joined, :transaction_history)
+                        ON CONFLICT(email) DO NOTHING''', new_user)
+        if cur.rowcount == 0:
+            conn.close()
+            return {"error": "User exists"}
         conn.commit()
         conn.close()
         
@@ -420,7 +731,7 @@ class BetHubBackend:
     def login_user(self, email, password):
         email = email.lower().strip()
         conn = get_db_connection()
-        row = conn.execute("SELECT * FROM user WHERE email=?", (email,)).fetchone()
+        row = conn.execute(SQL_GET_USER, (email,)).fetchone()
         conn.close()
         
         if not row:
@@ -445,7 +756,7 @@ class BetHubBackend:
     def create_bet(self, creator_email, title, description, bet_type, outcomes, end_time, base_price, category="Sports"):
         creator_email = creator_email.lower().strip()
         conn = get_db_connection()
-        user = conn.execute("SELECT * FROM user WHERE email=?", (creator_email,)).fetchone()
+        user = conn.execute(SQL_GET_USER, (creator_email,)).fetchone()
         
         if not user:
             conn.close()
@@ -464,19 +775,21 @@ class BetHubBackend:
                 return {"error": "Insufficient Private Cards"}
             
             # Deduct Card
-            import random, string
             cards -= 1
-            bet_code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
+            while True:
+                bet_code = ''.join(secrets.choice(_BET_CODE_ALPHABET) for _ in range(6))
+                if not conn.execute("SELECT 1 FROM bets WHERE bet_code=?", (bet_code,)).fetchone():
+                    break  # unique index on bet_code backstops this check
             conn.execute("UPDATE user SET pvt_cards=? WHERE email=?", (cards, creator_email))
         
         bet_id = str(uuid4())[:8]
         new_bet = {
             "id": bet_id, "title": title, "description": description, "creator": creator_email,
             "status": "OPEN", "bet_type": bet_type, "bet_code": bet_code,
-            "outcomes": json.dumps(outcomes), "odds": json.dumps({}),
+            "outcomes": _dumps(outcomes), "odds": _dumps({}),
             "pool": 0.0, "start_time": time.time(), "end_time": end_time,
             "result": None, "base_price": base_price,
-            "participants": json.dumps([]), "comments": json.dumps([]), "category": category
+            "participants": _dumps([]), "comments": _dumps([]), "category": category
         }
         
         conn.execute('''INSERT INTO bets (id, title, description, creator, status, bet_type, bet_code, outcomes, odds, pool, start_time, end_time, result, base_price, participants, comments, category)
@@ -484,19 +797,19 @@ class BetHubBackend:
         
         u_dict = dict_from_row(user)
         u_dict['bet_admin'].append(bet_id)
-        conn.execute("UPDATE user SET bet_admin=? WHERE email=?", (json.dumps(u_dict['bet_admin']), creator_email))
+        conn.execute("UPDATE user SET bet_admin=? WHERE email=?", (_dumps(u_dict['bet_admin']), creator_email))
         
         conn.commit()
         conn.close()
+        _bets_cache_clear()
         return new_bet
 
     def join_bet(self, email, bet_id, amount, prediction, via_code=False):
         email = email.lower().strip()
-        self.check_expirations()
-        
+
         conn = get_db_connection()
-        user_row = conn.execute("SELECT * FROM user WHERE email=?", (email,)).fetchone()
-        bet_row = conn.execute("SELECT * FROM bets WHERE id=?", (bet_id,)).fetchone()
+        user_row = conn.execute(SQL_GET_USER, (email,)).fetchone()
+        bet_row = conn.execute(SQL_GET_BET, (bet_id,)).fetchone()
         
         if not user_row or not bet_row:
             conn.close(); return {"error": "Not found"}
@@ -516,7 +829,8 @@ class BetHubBackend:
         if bet['status'] != "OPEN": conn.close(); return {"error": "Bet closed"}
         if any(p['user'] == email for p in bet['participants']): conn.close(); return {"error": "Already bet on this market"}
         if prediction not in bet['outcomes']: conn.close(); return {"error": "Invalid outcome"}
-        if time.time() > bet['end_time']: 
+        now = time.time()
+        if now > bet['end_time']:
             conn.close(); return {"error": "Bet time ended"}
 
         # Calculate Win Probability at time of betting
@@ -536,39 +850,54 @@ class BetHubBackend:
             # Should not happen as we just added amount, but safe fallback
             win_probability = 1.0 / len(bet['outcomes']) if bet['outcomes'] else 0.5
 
-        new_money = user['money'] - amount
-        new_pool = bet['pool'] + amount
-        
-        bet['participants'].append({
-            "user": email, 
-            "amount": amount, 
+        participant = {
+            "user": email,
+            "amount": amount,
             "prediction": prediction,
             "win_probability": win_probability
-        })
-        user['bet_joined'].append(bet_id)
-        
-        # Add Transaction Record
-        user['transaction_history'].append({
+        }
+        # Transaction record (appended server-side below)
+        txn_entry = {
             "type": "BET",
             "amount": -amount,
             "description": f"Joined bet: {bet['title']} (Prediction: {prediction})",
             "bet": bet_id,
-            "timestamp": time.time(),
-            "datetime": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()),
+            "timestamp": now,
             "win_prob_at_bet": win_probability
-        })
-        
-        conn.execute("UPDATE user SET money=?, bet_joined=?, transaction_history=? WHERE email=?", 
-                     (new_money, json.dumps(user['bet_joined']), json.dumps(user['transaction_history']), email))
-        
-        conn.execute("UPDATE bets SET pool=?, participants=? WHERE id=?", 
-                     (new_pool, json.dumps(bet['participants']), bet_id))
-        
+        }
+
+        # Atomic section: the money guard re-checks the balance inside the
+        # write lock, and json_insert appends the new elements in C without
+        # shipping the existing blobs through Python at all.
+        conn.execute("BEGIN IMMEDIATE")
+        debited = conn.execute(
+            "UPDATE user SET money = money - ?, "
+            "bet_joined = json_insert(COALESCE(bet_joined,'[]'), '$[#]', ?) "
+            "WHERE email=? AND money >= ? RETURNING money",
+            (amount, bet_id, email, amount)
+        ).fetchone()
+        if not debited:
+            conn.close()  # rolls back
+            return {"error": "Low funds"}
+        conn.execute(SQL_INSERT_TXN, (email, txn_entry['timestamp'], _dumps(txn_entry)))
+        joined = conn.execute(
+            "UPDATE bets SET pool = pool + ?, "
+            "participants = json_insert(COALESCE(participants,'[]'), '$[#]', json(?)) "
+            "WHERE id=? AND status='OPEN' RETURNING pool",
+            (amount, _dumps(participant), bet_id)
+        ).fetchone()
+        if not joined:
+            conn.close()  # rolls back
+            return {"error": "Bet closed"}
+
         conn.commit()
         conn.close()
-        
-        self.calculate_money(bet_id)
-        return {"status": "success", "new_balance": new_money}
+
+        # Reuse the bet we already parsed instead of re-reading the row
+        bet['participants'].append(participant)
+        bet['pool'] = joined['pool']
+        self.calculate_money(bet_id, bet)
+        return {"status": "success", "new_balance": debited['money']}
 
     def join_bet_by_code(self, email, bet_code, amount, prediction):
         bet = self.get_bet_by_code(bet_code)
@@ -578,7 +907,7 @@ class BetHubBackend:
 
     def declare_result(self, email, bet_id, result):
         conn = get_db_connection()
-        bet_row = conn.execute("SELECT * FROM bets WHERE id=?", (bet_id,)).fetchone()
+        bet_row = conn.execute(SQL_GET_BET, (bet_id,)).fetchone()
         if not bet_row: conn.close(); return {"error": "Bet not found"}
         
         bet = dict_from_row(bet_row)
@@ -587,6 +916,7 @@ class BetHubBackend:
         conn.execute("UPDATE bets SET status='RESULT_DECLARED', result=? WHERE id=?", (result, bet_id))
         conn.commit()
         conn.close()
+        _bets_cache_clear()
         
         self._payout(bet_id, result)
         return {"status": "result_declared"}
@@ -602,7 +932,7 @@ class BetHubBackend:
         CREATOR_COMMISSION_PERCENT = 0.01  # Creator gets 1%
 
         conn = get_db_connection()
-        bet = dict_from_row(conn.execute("SELECT * FROM bets WHERE id=?", (bet_id,)).fetchone())
+        bet = dict_from_row(conn.execute(SQL_GET_BET, (bet_id,)).fetchone())
         participants = bet['participants']
         
         if not participants:
@@ -614,130 +944,90 @@ class BetHubBackend:
             conn.close()
             return
 
+        # Accumulate (money_delta, entry, email) ledger rows and flush them
+        # with a single executemany below; deltas are applied in SQL so no
+        # user rows need to be read first.
+        ledger = []
+        now = time.time()
+        title = bet['title']
+
         # Step 1: Pay Creator Commission (1% of total pool)
         creator_commission = total_pool * CREATOR_COMMISSION_PERCENT
-        
-        creator_row = conn.execute("SELECT * FROM user WHERE email=?", (bet['creator'],)).fetchone()
-        if creator_row:
-            creator = dict_from_row(creator_row)
-            creator['money'] += creator_commission
-            creator['transaction_history'].append({
-                "type": "CREATOR_COMMISSION",
-                "amount": creator_commission,
-                "bet": bet_id,
-                "timestamp": time.time(),
-                "description": f"Creator commission for bet: {bet['title']}"
-            })
-            conn.execute("UPDATE user SET money=?, transaction_history=? WHERE email=?",
-                         (creator['money'], json.dumps(creator['transaction_history']), bet['creator']))
-
-        # Step 2: Identify Winners and Losers
-        winners = [p for p in participants if p['prediction'] == result]
-        losers = [p for p in participants if p['prediction'] != result]
-        
-        # If no winners, refund everyone proportionally (minus commission)
+        ledger.append((creator_commission, {
+            "type": "CREATOR_COMMISSION",
+            "amount": creator_commission,
+            "bet": bet_id,
+            "timestamp": now,
+            "description": f"Creator commission for bet: {title}"
+        }, bet['creator']))
+
+        # Step 2: Identify Winners and Losers (partition + totals in one pass)
+        winners = []
+        losers = []
+        total_winner_bets = 0.0
+        total_loser_bets = 0.0
+        for p in participants:
+            if p['prediction'] == result:
+                winners.append(p)
+                total_winner_bets += p['amount']
+            else:
+                losers.append(p)
+                total_loser_bets += p['amount']
+
         if not winners:
+            # No winners: refund everyone proportionally (minus commission)
             net_pool = total_pool - creator_commission
             for p in participants:
-                u_row = conn.execute("SELECT * FROM user WHERE email=?", (p['user'],)).fetchone()
-                if u_row:
-                    u = dict_from_row(u_row)
-                    refund_ratio = p['amount'] / total_pool
-                    refund_amt = net_pool * refund_ratio
-                    u['money'] += refund_amt
-                    u['transaction_history'].append({
-                        "type": "REFUND",
-                        "amount": refund_amt,
-                        "description": f"Refund (No winners): {bet['title']}",
-                        "timestamp": time.time()
-                    })
-                    conn.execute("UPDATE user SET money=?, transaction_history=? WHERE email=?", 
-                                 (u['money'], json.dumps(u['transaction_history']), p['user']))
-            conn.commit()
-            conn.close()
-            return
-
-        # If no losers, refund winners their original bets
-        if not losers:
+                refund_amt = net_pool * (p['amount'] / total_pool)
+                ledger.append((refund_amt, {
+                    "type": "REFUND",
+                    "amount": refund_amt,
+                    "description": f"Refund (No winners): {title}",
+                    "timestamp": now
+                }, p['user']))
+        elif not losers:
+            # No losers: refund winners their original bets
             for p in winners:
-                u_row = conn.execute("SELECT * FROM user WHERE email=?", (p['user'],)).fetchone()
-                if u_row:
-                    u = dict_from_row(u_row)
-                    u['money'] += p['amount']
-                    u['transaction_history'].append({
-                        "type": "REFUND",
-                        "amount": p['amount'],
-                        "description": f"Refund (No losers): {bet['title']}",
-                        "timestamp": time.time()
-                    })
-                    conn.execute("UPDATE user SET money=?, transaction_history=? WHERE email=?", 
-                                 (u['money'], json.dumps(u['transaction_history']), p['user']))
-            conn.commit()
-            conn.close()
-            return
+                ledger.append((p['amount'], {
+                    "type": "REFUND",
+                    "amount": p['amount'],
+                    "description": f"Refund (No losers): {title}",
+                    "timestamp": now
+                }, p['user']))
+        else:
+            # Step 3: Losing pool (60% of all losing bets) goes to winners
+            losing_pool = total_loser_bets * (1 - LOSER_REFUND_PERCENT)
 
-        # Step 3: Calculate losing pool (60% of all losing bets)
-        total_loser_bets = sum(p['amount'] for p in losers)
-        losing_pool = total_loser_bets * (1 - LOSER_REFUND_PERCENT)  # 60% goes to winners
-        
-        # Step 4: Process Losers - Give them 40% refund
-        for p in losers:
-            u_row = conn.execute("SELECT * FROM user WHERE email=?", (p['user'],)).fetchone()
-            if u_row:
-                u = dict_from_row(u_row)
-                
+            # Step 4: Losers get their 40% refund
+            for p in losers:
                 refund_amount = p['amount'] * LOSER_REFUND_PERCENT
-                
-                u['money'] += refund_amount
-                u['transaction_history'].append({
+                ledger.append((refund_amount, {
                     "type": "PARTIAL_REFUND",
                     "amount": refund_amount,
-                    "description": f"40% refund for losing bet: {bet['title']}",
-                    "timestamp": time.time()
-                })
-                
-                # Log the loss
-                loss_amount = p['amount'] * (1 - LOSER_REFUND_PERCENT)
-                u['transaction_history'].append({
+                    "description": f"40% refund for losing bet: {title}",
+                    "timestamp": now
+                }, p['user']))
+                ledger.append((0.0, {
                     "type": "LOSS",
-                    "amount": -loss_amount,
-                    "description": f"Loss from bet: {bet['title']}",
-                    "timestamp": time.time()
-                })
-                
-                conn.execute("UPDATE user SET money=?, transaction_history=? WHERE email=?", 
-                             (u['money'], json.dumps(u['transaction_history']), p['user']))
-
-        # Step 5: Calculate winner distribution proportionally
-        total_winner_bets = sum(p['amount'] for p in winners)
-        
-        # Step 6: Distribute to winners proportionally + return original stake
-        for p in winners:
-            u_row = conn.execute("SELECT * FROM user WHERE email=?", (p['user'],)).fetchone()
-            if u_row:
-                u = dict_from_row(u_row)
-                
-                # Calculate proportional share of losing pool
-                if total_winner_bets > 0:
-                    proportion = p['amount'] / total_winner_bets
-                else:
-                    proportion = 0
-                
+                    "amount": -(p['amount'] * (1 - LOSER_REFUND_PERCENT)),
+                    "description": f"Loss from bet: {title}",
+                    "timestamp": now
+                }, p['user']))
+
+            # Step 5/6: Winners split the losing pool proportionally + stake back
+            for p in winners:
+                proportion = (p['amount'] / total_winner_bets) if total_winner_bets > 0 else 0
                 profit = proportion * losing_pool
                 total_payout = p['amount'] + profit  # Original stake + profit
-                
-                u['money'] += total_payout
-                u['transaction_history'].append({
+                ledger.append((total_payout, {
                     "type": "WIN",
                     "amount": total_payout,
                     "profit": profit,
-                    "description": f"Won bet: {bet['title']} (Profit: {profit:.2f})",
-                    "timestamp": time.time()
-                })
-                
-                conn.execute("UPDATE user SET money=?, transaction_history=? WHERE email=?", 
-                             (u['money'], json.dumps(u['transaction_history']), p['user']))
+                    "description": f"Won bet: {title} (Profit: {profit:.2f})",
+                    "timestamp": now
+                }, p['user']))
 
+        _apply_ledger(conn, ledger)
         conn.commit()
         conn.close()
 
@@ -751,123 +1041,130 @@ class BetHubBackend:
         
         bet = dict_from_row(bet_row)
         
-        # Refund all participants
-        refund_count = 0
-        for participant in bet['participants']:
-            user_row = conn.execute("SELECT * FROM user WHERE email=?", (participant['user'],)).fetchone()
-            if user_row:
-                user = dict_from_row(user_row)
-                
+        # Refund all participants: one existence check for the whole batch
+        # instead of one SELECT per participant, then a single executemany
+        refunds = []
+        participants = bet['participants']
+        known = set()
+        if participants:
+            emails = list({p['user'] for p in participants})
+            placeholders = ','.join('?' * len(emails))
+            known = {r['email'] for r in
+                     conn.execute(f"SELECT email FROM user WHERE email IN ({placeholders})", emails).fetchall()}
+        now = time.time()
+        for participant in participants:
+            if participant['user'] in known:
                 # Use Risk-Adjusted Refund Logic if applicable
                 refund_amount = self.calculate_refund_amount(participant['amount'], bet['pool'], participant['amount']) # Simplified for close_bet context
 
                 refund_amount = participant['amount'] # Full refund on admin close
-                user['money'] += refund_amount
-                
-                # Add refund transaction
-                user['transaction_history'].append({
+
+                refunds.append((refund_amount, {
                     "type": "REFUND",
                     "amount": refund_amount,
                     "description": f"Refund from closed bet: {bet['title']}",
-                    "timestamp": time.time(),
-                    "datetime": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
-                })
-                
-                conn.execute("UPDATE user SET money=?, transaction_history=? WHERE email=?",
-                           (user['money'], json.dumps(user['transaction_history']), participant['user']))
-                refund_count += 1
+                    "timestamp": now
+                }, participant['user']))
+        _apply_ledger(conn, refunds)
+        refund_count = len(refunds)
         
         # Update bet status to CLOSED
         conn.execute("UPDATE bets SET status='CLOSED' WHERE id=?", (bet_id,))
         conn.commit()
         conn.close()
+        _bets_cache_clear()
         
         return {"status": "bet_closed", "refunds_issued": refund_count}
 
     def add_comment(self, email, bet_id, text):
         conn = get_db_connection()
-        bet_row = conn.execute("SELECT * FROM bets WHERE id=?", (bet_id,)).fetchone()
-        user_row = conn.execute("SELECT * FROM user WHERE email=?", (email,)).fetchone()
-        
+        # Only the columns this method touches; membership is an EXISTS over
+        # json_each so the participants blob never reaches Python at all
+        bet_row = conn.execute(
+            "SELECT creator, comments, "
+            "EXISTS(SELECT 1 FROM json_each(COALESCE(bets.participants,'[]')) "
+            "WHERE value->>'user'=?) AS is_participant "
+            "FROM bets WHERE id=?", (email, bet_id)).fetchone()
+        user_row = conn.execute("SELECT name FROM user WHERE email=?", (email,)).fetchone()
+
         if not bet_row or not user_row:
             conn.close()
             return {"error": "Bet or User not found"}
-            
+
         bet = dict_from_row(bet_row)
-        user = dict_from_row(user_row)
-        participants = bet['participants']
-        
+        user = user_row
+
         # Only participants or creator can comment
-        if not (any(p['user'] == email for p in participants) or bet['creator'] == email):
+        if not (bet_row['is_participant'] or bet['creator'] == email):
             conn.close()
             return {"error": "Only participants or creator can comment"}
             
+        now = time.time()
         new_comment = {
-            "id": str(uuid4())[:8], # Add ID for liking
+            "id": secrets.token_hex(4), # Add ID for liking
             "user": email,
             "name": user['name'],
             "text": text,
             "likes": [], # List of user emails
-            "timestamp": time.time(),
-            "datetime": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+            "timestamp": now
         }
         
         current_comments = bet['comments'] if bet['comments'] else []
         current_comments.append(new_comment)
-        
-        conn.execute("UPDATE bets SET comments=? WHERE id=?", (json.dumps(current_comments), bet_id))
+
+        # Append just the new comment server-side; the response still carries
+        # the full list we already parsed
+        conn.execute("UPDATE bets SET comments=json_insert(COALESCE(comments,'[]'), '$[#]', json(?)) WHERE id=?",
+                     (_dumps(new_comment), bet_id))
         conn.commit()
         conn.close()
+        _bets_cache_clear()
         
         return {"status": "success", "comments": current_comments}
 
     def toggle_like(self, email, bet_id, comment_id):
-        print(f"DEBUG: toggle_like called for user={email}, bet={bet_id}, comment={comment_id}")
+        logger.debug("toggle_like called for user=%s, bet=%s, comment=%s", email, bet_id, comment_id)
         conn = get_db_connection()
-        bet_row = conn.execute("SELECT * FROM bets WHERE id=?", (bet_id,)).fetchone()
-        
-        if not bet_row:
-            print("DEBUG: Bet not found")
+
+        # Locate the comment inside the blob with json_each: only its index
+        # and likes list cross into Python, not the whole comments array
+        row = conn.execute(
+            "SELECT key, value->>'likes' AS likes "
+            "FROM bets, json_each(COALESCE(bets.comments,'[]')) "
+            "WHERE bets.id=? AND value->>'id'=?",
+            (bet_id, comment_id)).fetchone()
+
+        if not row:
+            exists = conn.execute("SELECT 1 FROM bets WHERE id=?", (bet_id,)).fetchone()
+            logger.debug("Comment not found" if exists else "Bet not found")
             conn.close()
-            return {"error": "Bet not found"}
-            
-        bet = dict_from_row(bet_row)
-        comments = bet['comments'] if bet['comments'] else []
-        print(f"DEBUG: Found {len(comments)} comments. Searching for {comment_id}")
-        
-        target_comment = next((c for c in comments if c.get('id') == comment_id), None)
-        
-        if not target_comment:
-             print("DEBUG: Comment not found")
-             # Debug dump IDs
-             print(f"DEBUG: Available IDs: {[c.get('id') for c in comments]}")
-             conn.close()
-             return {"error": "Comment not found"}
-             
-        if 'likes' not in target_comment:
-            target_comment['likes'] = []
-            
-        if email in target_comment['likes']:
-            target_comment['likes'].remove(email)
+            return {"error": "Comment not found"} if exists else {"error": "Bet not found"}
+
+        likes = _loads(row['likes']) if row['likes'] else []
+
+        if email in likes:
+            likes.remove(email)
             action = "unliked"
         else:
-            target_comment['likes'].append(email)
+            likes.append(email)
             action = "liked"
-            
-        print(f"DEBUG: Action={action}. New likes count: {len(target_comment['likes'])}")
-            
-        conn.execute("UPDATE bets SET comments=? WHERE id=?", (json.dumps(comments), bet_id))
+
+        logger.debug("Action=%s. New likes count: %d", action, len(likes))
+
+        conn.execute("UPDATE bets SET comments=json_set(comments, ?, json(?)) WHERE id=?",
+                     (f"$[{row['key']}].likes", _dumps(likes), bet_id))
         conn.commit()
         conn.close()
-        
-        return {"status": "success", "action": action, "likes": target_comment['likes']}
+        _bets_cache_clear()
+
+        return {"status": "success", "action": action, "likes": likes}
 
         
     def apply_loan(self, email, amount):
         conn = get_db_connection()
-        user_row = conn.execute("SELECT * FROM user WHERE email=?", (email,)).fetchone()
+        user_row = conn.execute("SELECT money, loan, trust, loans_taken FROM user WHERE email=?", (email,)).fetchone()
         if not user_row: conn.close(); return {"error": "User not found"}
-        user = dict_from_row(user_row)
+        user = user_row
         
         if user['trust'] < 300: conn.close(); return {"error": "Trust too low for new loans"}
         
@@ -877,9 +1174,10 @@ class BetHubBackend:
              return {"error": f"Loan limit exceeded based on Trust Score. Limit: {limit}"}
         
         # --- Dynamic Loan Logic ---
+        now = time.time()
         # 1. Due Date: 100 coins = 1 Day
         duration_days = math.ceil(amount / 100.0)
-        due_date = time.time() + (duration_days * 86400)
+        due_date = now + (duration_days * 86400)
         
         # 2. Interest Rate Calculation
         # Base: 6%
@@ -900,31 +1198,33 @@ class BetHubBackend:
         user['money'] += amount
         user['loan'] += total_repayment
         user['loans_taken'] += 1
-        user['last_loan_timestamp'] = time.time()
+        user['last_loan_timestamp'] = now
         
         # Store Loan Details
         user['loan_interest_rate'] = final_rate
         user['loan_due_date'] = due_date
         user['loan_total_interest'] = total_interest
         
-        user['transaction_history'].append({
+        entry = {
             "type": "LOAN",
             "amount": amount,
             "description": f"Loan taken: ${amount} (Rate: {final_rate*100:.1f}%, Due: {duration_days} days)",
-            "timestamp": time.time(),
-            "datetime": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
-        })
-        
-        conn.execute("UPDATE user SET loan=?, money=?, trust=?, loans_taken=?, last_loan_timestamp=?, loan_interest_rate=?, loan_due_date=?, loan_total_interest=?, transaction_history=? WHERE email=?", 
-                     (user['loan'], user['money'], user['trust'], user['loans_taken'], user['last_loan_timestamp'], user['loan_interest_rate'], user['loan_due_date'], user['loan_total_interest'], json.dumps(user['transaction_history']), email))
+            "timestamp": now
+        }
+        conn.execute(SQL_INSERT_TXN, (email, entry['timestamp'], _dumps(entry)))
+
+        conn.execute("UPDATE user SET loan=?, money=?, trust=?, loans_taken=?, last_loan_timestamp=?, loan_interest_rate=?, loan_due_date=?, loan_total_interest=? WHERE email=?",
+                     (user['loan'], user['money'], user['trust'], user['loans_taken'], user['last_loan_timestamp'], user['loan_interest_rate'], user['loan_due_date'], user['loan_total_interest'], email))
         conn.commit()
         conn.close()
         return user
 
     def repay_loan(self, email, amount):
         conn = get_db_connection()
-        user_row = conn.execute("SELECT * FROM user WHERE email=?", (email,)).fetchone()
-        user = dict_from_row(user_row)
+        user_row = conn.execute(
+            "SELECT money, loan, trust, last_loan_timestamp, loans_taken, loans_repaid, "
+            "on_time_repayments, default_count FROM user WHERE email=?", (email,)).fetchone()
+        user = user_row
         
         if user['money'] < amount: conn.close(); return {"error": "Insufficient funds"}
         
@@ -934,8 +1234,9 @@ class BetHubBackend:
         
         # Anti-Gaming Check: Only improve trust if loan held for > 5 minutes (300 seconds)
         # OR if it's a very old loan (handle None case just in case)
+        now = time.time()
         last_loan_time = user.get('last_loan_timestamp', 0) or 0
-        time_diff = time.time() - last_loan_time
+        time_diff = now - last_loan_time
         
         if time_diff > 300:
             user['loans_repaid'] = (user['loans_repaid'] or 0) + 1
@@ -946,15 +1247,15 @@ class BetHubBackend:
             new_trust = self.calculate_trust_score(user)
             user['trust'] = new_trust
         
-        user['transaction_history'].append({
-            "type": "REPAY", 
+        entry = {
+            "type": "REPAY",
             "amount": -eff_amount,
-            "timestamp": time.time(),
-            "datetime": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
-        })
-        
-        conn.execute("UPDATE user SET loan=?, money=?, trust=?, loans_repaid=?, on_time_repayments=?, transaction_history=? WHERE email=?", 
-                     (user['loan'], user['money'], user['trust'], user['loans_repaid'], user['on_time_repayments'], json.dumps(user['transaction_history']), email))
+            "timestamp": now
+        }
+        conn.execute(SQL_INSERT_TXN, (email, entry['timestamp'], _dumps(entry)))
+
+        conn.execute("UPDATE user SET loan=?, money=?, trust=?, loans_repaid=?, on_time_repayments=? WHERE email=?",
+                     (user['loan'], user['money'], user['trust'], user['loans_repaid'], user['on_time_repayments'], email))
         conn.commit()
         conn.close()
         return user
@@ -963,7 +1264,7 @@ class BetHubBackend:
 # FASTAPI APPLICATION & API MODELS
 # ==========================================
 
-app = FastAPI(title="BetHub API")
+app = FastAPI(title="BetHub API", default_response_class=ORJSONResponse if orjson else JSONResponse)
 backend = BetHubBackend()
 
 # --- INPUT MODELS ---
@@ -1002,6 +1303,13 @@ class JoinBetCode(BaseModel):
     amount: float
     prediction: str
 
+class CommentCreate(BaseModel):
+    email: str
+    text: str
+
+class CommentLike(BaseModel):
+    email: str
+
 class DeclareResult(BaseModel):
     email: str
     bet_id: str
@@ -1013,9 +1321,24 @@ class CloseBet(BaseModel):
 
 # --- ROUTES ---
 
+async def _expiry_sweeper():
+    # Periodic sweep so read endpoints never pay for expiring bets inline
+    while True:
+        await asyncio.sleep(_EXPIRY_CHECK_INTERVAL)
+        try:
+            await run_in_threadpool(backend.check_expirations, force=True)
+        except Exception:
+            logger.exception("expiration sweep failed")
+
 @app.on_event("startup")
 async def startup_event():
     backend.init_db()
+    app.state.expiry_task = asyncio.create_task(_expiry_sweeper())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.expiry_task.cancel()
+    close_pool()
 
 @app.get("/")
 def home():
@@ -1055,8 +1378,7 @@ def create_bet(data: CreateBet, background_tasks: BackgroundTasks, current_user:
 
 @app.get("/bets")
 def get_all_bets(type: Optional[str] = None):
-    # Helper to check stats on read to ensure fresh view
-    backend.check_expirations()
+    # Expirations are swept by the background task, not on the read path
     return backend.get_bets(type)
 
 @app.get("/bet-by-code/{bet_code}")
@@ -1103,9 +1425,19 @@ def get_bet_details(bet_id: str, email: str = None):
 
 @app.get("/user/{email}/transactions")
 def get_user_transactions(email: str):
-    user = backend.get_user(email)
-    if not user: raise HTTPException(404, "User not found")
-    return user.get('transaction_history', [])
+    # Entries are stored as JSON text, so the response array is assembled
+    # by json_group_array in C and streamed through without a decode.
+    email = email.lower().strip()
+    conn = get_db_connection()
+    if not conn.execute("SELECT 1 FROM user WHERE email=?", (email,)).fetchone():
+        conn.close()
+        raise HTTPException(404, "User not found")
+    row = conn.execute(
+        "SELECT json_group_array(json(entry)) AS history FROM "
+        "(SELECT entry FROM transactions WHERE email=? ORDER BY ts DESC)",
+        (email,)).fetchone()
+    conn.close()
+    return Response(content=row['history'] or "[]", media_type="application/json")
 
 # CORS
 app.add_middleware(
@@ -1113,22 +1445,22 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    max_age=86400,  # let browsers cache preflights instead of re-asking
 )
 
 @app.post("/bets/{bet_id}/comments")
-async def post_comment(bet_id: str, req: Request, current_user: str = Depends(get_current_user)):
-    data = await req.json()
-    if data.get('email') != current_user:
+async def post_comment(bet_id: str, data: CommentCreate, current_user: str = Depends(get_current_user)):
+    if data.email != current_user:
         raise HTTPException(403, "Not authorized to post comment as another user")
-    res = backend.add_comment(data.get('email'), bet_id, data.get('text'))
+    # Blocking sqlite work must not run on the event loop
+    res = await run_in_threadpool(backend.add_comment, data.email, bet_id, data.text)
     return res
 
 @app.post("/bets/{bet_id}/comments/{comment_id}/like")
-async def like_comment(bet_id: str, comment_id: str, req: Request, current_user: str = Depends(get_current_user)):
-    data = await req.json()
-    if data.get('email') != current_user:
+async def like_comment(bet_id: str, comment_id: str, data: CommentLike, current_user: str = Depends(get_current_user)):
+    if data.email != current_user:
         raise HTTPException(403, "Not authorized to like comment as another user")
-    return backend.toggle_like(data.get('email'), bet_id, comment_id)
+    return await run_in_threadpool(backend.toggle_like, data.email, bet_id, comment_id)
 
 if __name__ == "__main__":
     import uvicorn